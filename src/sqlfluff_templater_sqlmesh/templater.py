@@ -1,11 +1,12 @@
 """Defines a SQLMesh templater."""
 
-import logging
 import os
 import os.path
+import re
+import threading
 import typing as t
 
-from sqlfluff.core.errors import SQLFluffSkipFile, SQLFluffUserError, SQLTemplaterError
+from sqlfluff.core.errors import SQLFluffSkipFile, SQLFluffUserError
 from sqlfluff.core.templaters.base import (
     RawFileSlice,
     RawTemplater,
@@ -13,195 +14,391 @@ from sqlfluff.core.templaters.base import (
     TemplatedFileSlice,
     large_file_check,
 )
-from sqlglot.tokens import Tokenizer, TokenType
 
 if t.TYPE_CHECKING:  # pragma: no cover
     from sqlfluff.cli.formatters import OutputStreamFormatter
     from sqlfluff.core import FluffConfig
+    from sqlfluff.core.errors import SQLTemplaterError
+    from sqlglot.tokens import Tokenizer
 
-templater_logger = logging.getLogger("sqlfluff.templater")
+_LITERAL = "literal"
+_TEMPLATED = "templated"
+
+# Stands in for the arguments of a macro function call in the templated SQL
+_PLACEHOLDER = "'PLACEHOLDER'"
+_PLACEHOLDER_LEN = len(_PLACEHOLDER)
+
+_SELECT_RE = re.compile(r"select\b", re.IGNORECASE)
+_STATEMENT_SCAN_RE = re.compile(r"--|/\*|['\";()]|\bselect\b", re.IGNORECASE)
+_MACRO_RE = re.compile(r"@\w*\s*(\()?")
+
+_thread_local = threading.local()
+
+
+def _get_tokenizer(dialect: t.Optional[str]) -> "Tokenizer":
+    """Get the SQLGlot tokenizer for the given dialect.
+
+    Tokenizers are reused across files, but they keep scanning state on the
+    instance, so each thread gets its own.
+
+    Args:
+        dialect: The SQLGlot dialect name.
+
+    Returns:
+        A Tokenizer configured for the dialect.
+    """
+    tokenizers: t.Optional[t.Dict[t.Optional[str], Tokenizer]]
+    tokenizers = getattr(_thread_local, "tokenizers", None)
+    if tokenizers is None:
+        tokenizers = _thread_local.tokenizers = {}
+    tokenizer = tokenizers.get(dialect)
+    if tokenizer is None:
+        from sqlglot.dialects.dialect import Dialect
+
+        tokenizer_class = Dialect.get_or_raise(dialect).tokenizer_class
+        tokenizer = tokenizers[dialect] = tokenizer_class(dialect=dialect)
+    return tokenizer
+
+
+def _skip_quoted(input_str: str, pos: int, quote: str) -> int:
+    """Skip over a quoted string or identifier.
+
+    Args:
+        input_str: The entire SQL script as a string.
+        pos: The index just after the opening quote.
+        quote: The quote character, which is escaped by doubling it.
+
+    Returns:
+        The index just after the closing quote, or the end of the script.
+    """
+    while True:
+        end = input_str.find(quote, pos)
+        if end < 0:
+            return len(input_str)
+        if not input_str.startswith(quote, end + 1):
+            return end + 1
+        pos = end + 2
+
+
+def _skip_block_comment(input_str: str, pos: int) -> int:
+    """Skip over a (possibly nested) block comment.
+
+    Args:
+        input_str: The entire SQL script as a string.
+        pos: The index just after the opening '/*'.
+
+    Returns:
+        The index just after the closing '*/', or the end of the script.
+    """
+    depth = 1
+    close_idx = -1
+    while depth > 0:
+        if close_idx < pos:
+            close_idx = input_str.find("*/", pos)
+            if close_idx < 0:
+                return len(input_str)
+        open_idx = input_str.find("/*", pos, close_idx)
+        if open_idx < 0:
+            depth -= 1
+            pos = close_idx + 2
+        else:
+            depth += 1
+            pos = open_idx + 2
+    return pos
+
+
+def _find_select_statement(
+    input_str: str,
+) -> t.Optional[t.Tuple[int, int, t.Dict[int, int]]]:
+    """Locate the first SELECT statement with a lightweight scan of the script.
+
+    Only the SELECT keyword, parentheses, the ';' terminator and the characters
+    opening a comment, string literal or quoted identifier are visited. The bodies
+    of the latter are jumped over with `str.find`, mirroring the lexical rules of
+    the default SQLGlot tokenizer.
+
+    Args:
+        input_str: The entire SQL script as a string.
+
+    Returns:
+        The start and end index of the SELECT statement, excluding the ';', and a
+        mapping of the index of each '(' in the statement to the index of its
+        matching ')', or None if there is no SELECT statement.
+    """
+    select_start = None
+    paren_match: t.Dict[int, int] = {}
+    open_parens: t.List[int] = []
+    pos = 0
+    while True:
+        match = _STATEMENT_SCAN_RE.search(input_str, pos)
+        if match is None:
+            break
+        token, pos = match.group(), match.end()
+        if token == "--":
+            newline_idx = input_str.find("\n", pos)
+            pos = len(input_str) if newline_idx < 0 else newline_idx + 1
+        elif token == "/*":
+            pos = _skip_block_comment(input_str, pos)
+        elif token == "'" or token == '"':
+            pos = _skip_quoted(input_str, pos, token)
+        elif select_start is None:
+            if token not in ("(", ")", ";"):
+                select_start = match.start()
+        elif token == "(":
+            open_parens.append(match.start())
+        elif token == ")":
+            if open_parens:
+                paren_match[open_parens.pop()] = match.start()
+        elif token == ";":
+            return select_start, match.start(), paren_match
+
+    if select_start is None:
+        return None
+    return select_start, len(input_str), paren_match
+
+
+def _find_select_statement_sqlglot(
+    input_str: str, dialect: t.Optional[str]
+) -> t.Optional[t.Tuple[int, int, t.Dict[int, int]]]:
+    """Locate the first SELECT statement using the dialect's SQLGlot tokenizer.
+
+    This is slower than `_find_select_statement`, but respects dialect specific
+    lexical rules, such as '#' comments or backtick quoted identifiers.
+
+    Args:
+        input_str: The entire SQL script as a string.
+        dialect: The SQLGlot dialect name.
+
+    Returns:
+        The start and end index of the SELECT statement, excluding the ';', and a
+        mapping of the index of each '(' in the statement to the index of its
+        matching ')', or None if there is no SELECT statement.
+    """
+    # A SELECT keyword token always matches this, so if the pattern does not occur
+    # anywhere there is nothing to lint and tokenizing can be skipped entirely.
+    # The match is not used as a starting offset: it may sit inside a comment or
+    # string literal, which only the tokenizer can tell apart.
+    if not _SELECT_RE.search(input_str):
+        return None
+
+    # SQLGlot is heavy to import and only needed here, so it is loaded lazily to
+    # keep it off the startup path of every sqlfluff invocation
+    from sqlglot.tokens import TokenType
+
+    select_tt, semicolon_tt = TokenType.SELECT, TokenType.SEMICOLON
+    l_paren_tt, r_paren_tt = TokenType.L_PAREN, TokenType.R_PAREN
+
+    tokens = _get_tokenizer(dialect).tokenize(input_str)
+
+    # The scan is a two-state machine: before and within the SELECT statement.
+    # Each state gets its own loop over a shared iterator, so tokens before the
+    # SELECT are only checked against the one token type that ends that state.
+    token_iter = iter(tokens)
+    for token in token_iter:
+        if token.token_type is select_tt:
+            select_start_pos = token.start
+            break
+    else:
+        return None
+
+    paren_match: t.Dict[int, int] = {}
+    open_parens: t.List[int] = []
+    for token in token_iter:
+        token_type = token.token_type
+        if token_type is l_paren_tt:
+            open_parens.append(token.start)
+        elif token_type is r_paren_tt:
+            if open_parens:
+                paren_match[open_parens.pop()] = token.start
+        elif token_type is semicolon_tt:
+            return select_start_pos, token.end, paren_match
+    return select_start_pos, len(input_str), paren_match
+
+
+def _find_closing_paren(select_statement: str, pos: int) -> int:
+    """Find the closing parenthesis by counting parentheses in the raw text.
+
+    This is the fallback for a '(' that was not matched while locating the SELECT
+    statement, e.g. because it sits inside a string literal or is unbalanced.
+
+    Args:
+        select_statement: The SELECT statement string from the source SQL.
+        pos: The index just after the opening '('.
+
+    Returns:
+        The index of the matching ')', or the last index of the statement if the
+        parentheses are unbalanced.
+    """
+    paren_count = 1
+    close_idx = -1
+    while paren_count > 0:
+        # Jump straight to the next parenthesis rather than
+        # walking the arguments one character at a time
+        if close_idx < pos:
+            close_idx = select_statement.find(")", pos)
+            if close_idx < 0:
+                return len(select_statement) - 1
+        open_idx = select_statement.find("(", pos, close_idx)
+        if open_idx < 0:
+            paren_count -= 1
+            pos = close_idx + 1
+        else:
+            paren_count += 1
+            pos = open_idx + 1
+    return pos - 1
 
 
 def _process_select_statement(
-    select_statement: str, select_start: int
+    select_statement: str, select_start: int, paren_match: t.Dict[int, int]
 ) -> t.Tuple[str, t.List[RawFileSlice], t.List[TemplatedFileSlice]]:
     """Process the SELECT statement, removing '@' symbols and handling macro func calls.
 
     Args:
         select_statement: The SELECT statement string from the source SQL.
         select_start: The starting index of the SELECT statement in the source SQL.
+        paren_match: Maps the source index of each '(' in the statement to the
+            source index of its matching ')'.
 
     Returns:
         A tuple containing the processed SELECT statement, a list of RawFileSlice,
         and a list of TemplatedFileSlice for accurate mapping.
     """
-    output: t.List[str] = []
+    if "@" not in select_statement:
+        # Without macros the whole statement is copied verbatim as one literal
+        select_end = select_start + len(select_statement)
+        return (
+            select_statement,
+            [
+                RawFileSlice(
+                    raw=select_statement,
+                    slice_type=_LITERAL,
+                    source_idx=select_start,
+                )
+            ],
+            [
+                TemplatedFileSlice(
+                    slice_type=_LITERAL,
+                    source_slice=slice(select_start, select_end),
+                    templated_slice=slice(0, len(select_statement)),
+                )
+            ],
+        )
 
     pos, tpl_pos = 0, 0
-    raw_slices, tpl_slices = [], []
 
-    current_slice_type = None
-    current_raw_slice_start = 0
-    current_tpl_slice_start = 0
+    # The slices are contiguous in both the source and the templated string, so
+    # only their start offsets are recorded here. Each slice ends where the next
+    # one starts, and the slice objects are only built once the scan is done.
+    slice_types: t.List[str] = []
+    source_starts: t.List[int] = []
+    templated_starts: t.List[int] = []
 
     def _start_new_slice(slice_type: str, source_idx: int, templated_idx: int) -> None:
-        """Start a new slice.
+        """Start a new slice, implicitly ending the previous one.
 
         Args:
             slice_type: The type of the slice (e.g., 'literal', 'templated').
             source_idx: The starting index of the slice in the source SQL.
             templated_idx: The starting index of the slice in the templated SQL.
         """
-        nonlocal current_slice_type, current_raw_slice_start, current_tpl_slice_start
-        current_slice_type = slice_type
-        current_raw_slice_start = source_idx
-        current_tpl_slice_start = templated_idx
-
-    def _end_current_slice(source_idx: int, templated_idx: int) -> None:
-        """End the current slice.
-
-        Args:
-            source_idx: The ending index of the slice in the source SQL.
-            templated_idx: The ending index of the slice in the templated SQL.
-        """
-        nonlocal current_slice_type, current_raw_slice_start, current_tpl_slice_start
-        if current_slice_type is not None:
-            raw_slice = select_statement[
-                current_raw_slice_start - select_start : source_idx - select_start
-            ]
-            raw_slices.append(
-                RawFileSlice(
-                    raw=raw_slice,
-                    slice_type=current_slice_type,
-                    source_idx=current_raw_slice_start,
-                )
-            )
-            tpl_slices.append(
-                TemplatedFileSlice(
-                    slice_type=current_slice_type,
-                    source_slice=slice(current_raw_slice_start, source_idx),
-                    templated_slice=slice(current_tpl_slice_start, templated_idx),
-                )
-            )
-            current_slice_type = None
-            current_raw_slice_start = None
-            current_tpl_slice_start = None
-
-    while pos < len(select_statement):
-        c = select_statement[pos]
-        source_idx = select_start + pos
-
-        if c == "@":
-            # End current literal slice before '@'
-            _end_current_slice(source_idx, tpl_pos)
-
-            # Process '@' symbol (removed in output)
-            # Create a templated slice for '@' with zero length in output
-            raw_slices.append(
-                RawFileSlice(raw="@", slice_type="templated", source_idx=source_idx)
-            )
-            tpl_slices.append(
-                TemplatedFileSlice(
-                    slice_type="templated",
-                    source_slice=slice(source_idx, source_idx + 1),
-                    templated_slice=slice(tpl_pos, tpl_pos),
-                )
-            )
-            pos += 1  # Skip '@'
-
-            # Start a new literal slice after '@'
-            _start_new_slice("literal", source_idx + 1, tpl_pos)
-
-            # Collect identifier (function name or variable name)
-            ident_start = pos
-            while pos < len(select_statement) and (
-                select_statement[pos].isalnum() or select_statement[pos] == "_"
-            ):
-                pos += 1
-            ident_end = pos
-            ident = select_statement[ident_start:ident_end]
-            output.append(ident)
-            tpl_pos += len(ident)
-
-            # Collect any whitespace (include in current literal slice)
-            while pos < len(select_statement) and select_statement[pos].isspace():
-                output.append(select_statement[pos])
-                tpl_pos += 1
-                pos += 1
-
-            # Check if it's a function call
-            if pos < len(select_statement) and select_statement[pos] == "(":
-                # Include '(' in current literal slice
-                output.append("(")
-                tpl_pos += 1
-                pos += 1
-
-                # End current literal slice before function arguments
-                _end_current_slice(select_start + pos, tpl_pos)
-
-                # Process function arguments (replace with 'PLACEHOLDER')
-                func_args_start = pos
-                paren_count = 1
-                while pos < len(select_statement) and paren_count > 0:
-                    if select_statement[pos] == "(":
-                        paren_count += 1
-                    elif select_statement[pos] == ")":
-                        paren_count -= 1
-                    pos += 1
-                func_args_end = pos - 1  # Index of the closing ')'
-
-                func_args_source_start = select_start + func_args_start
-                func_args_source_end = select_start + func_args_end
-
-                # Replace function arguments with 'PLACEHOLDER'
-                placeholder = "'PLACEHOLDER'"
-                raw_slices.append(
-                    RawFileSlice(
-                        raw=select_statement[func_args_start:func_args_end],
-                        slice_type="templated",
-                        source_idx=func_args_source_start,
-                    )
-                )
-                tpl_slices.append(
-                    TemplatedFileSlice(
-                        slice_type="templated",
-                        source_slice=slice(
-                            func_args_source_start, func_args_source_end
-                        ),
-                        templated_slice=slice(tpl_pos, tpl_pos + len(placeholder)),
-                    )
-                )
-                output.append(placeholder)
-                tpl_pos += len(placeholder)
-
-                # Process closing ')'
-                c = select_statement[func_args_end]
-                source_idx = select_start + func_args_end
-                _start_new_slice("literal", source_idx, tpl_pos)
-                output.append(c)
-                tpl_pos += 1
-                pos = func_args_end + 1
+        slice_types.append(slice_type)
+        source_starts.append(source_idx)
+        templated_starts.append(templated_idx)
+
+    # Every macro ends in a literal slice, which any plain SQL after it simply
+    # extends, so only a leading run of plain SQL needs a slice of its own.
+    if not select_statement.startswith("@"):
+        _start_new_slice(_LITERAL, select_start, tpl_pos)
+
+    n = len(select_statement)
+    while True:
+        # Jump to the next macro; everything before it is plain SQL. A single
+        # match covers the '@', the identifier (function or variable name), any
+        # whitespace after it and the '(' of a function call
+        match = _MACRO_RE.search(select_statement, pos)
+        if match is None:
+            break
+        at_idx = match.start()
+        tpl_pos += at_idx - pos
+        source_idx = select_start + at_idx
+
+        # Process '@' symbol (removed in output)
+        # Create a templated slice for '@' with zero length in output
+        _start_new_slice(_TEMPLATED, source_idx, tpl_pos)
+
+        # Start a new literal slice after '@' for the rest of the match
+        _start_new_slice(_LITERAL, source_idx + 1, tpl_pos)
+        pos = match.end()
+        tpl_pos += pos - at_idx - 1
+
+        # Check if it's a function call
+        if match.group(1):
+            close_idx = paren_match.get(select_start + match.start(1))
+
+            # Process function arguments (replace with 'PLACEHOLDER')
+            _start_new_slice(_TEMPLATED, select_start + pos, tpl_pos)
+            if close_idx is not None:
+                func_args_end = close_idx - select_start  # Index of the closing ')'
             else:
-                # Not a function call; continue in current literal slice
-                pass
-        else:
-            # Regular character
-            if current_slice_type != "literal":
-                # Start new literal slice
-                _start_new_slice("literal", source_idx, tpl_pos)
-            output.append(c)
-            tpl_pos += 1
-            pos += 1
+                func_args_end = _find_closing_paren(select_statement, pos)
 
-    # End any remaining slice
-    _end_current_slice(select_start + pos, tpl_pos)
+            tpl_pos += _PLACEHOLDER_LEN
 
-    processed_select = "".join(output)
+            # Process closing ')'
+            _start_new_slice(_LITERAL, select_start + func_args_end, tpl_pos)
+            tpl_pos += 1
+            pos = func_args_end + 1
+
+    tpl_pos += n - pos
+
+    source_ends = source_starts[1:] + [select_start + n]
+    templated_ends = templated_starts[1:] + [tpl_pos]
+    # These are built positionally, skipping keyword argument matching per slice:
+    # RawFileSlice(raw, slice_type, source_idx) and
+    # TemplatedFileSlice(slice_type, source_slice, templated_slice)
+    raw_slices = [
+        RawFileSlice(
+            select_statement[source_start - select_start : source_end - select_start],
+            slice_type,
+            source_start,
+        )
+        for slice_type, source_start, source_end in zip(
+            slice_types, source_starts, source_ends
+        )
+    ]
+    tpl_slices = [
+        TemplatedFileSlice(
+            slice_type,
+            slice(source_start, source_end),
+            slice(templated_start, templated_end),
+        )
+        for slice_type, source_start, source_end, templated_start, templated_end in zip(
+            slice_types, source_starts, source_ends, templated_starts, templated_ends
+        )
+    ]
+
+    # Literal slices are copied verbatim and the only templated slices with any
+    # output are the replaced macro arguments, so the templated string can be
+    # stitched together from whole runs rather than accumulated per character.
+    processed_select = "".join(
+        raw_slice.raw
+        if raw_slice.slice_type == _LITERAL
+        else (
+            _PLACEHOLDER
+            if tpl_slice.templated_slice.stop > tpl_slice.templated_slice.start
+            else ""
+        )
+        for raw_slice, tpl_slice in zip(raw_slices, tpl_slices)
+    )
     return processed_select, raw_slices, tpl_slices
 
 
 def _process_sql_script(
-    input_str: str, fname: str = "<string>", *, dialect: str
+    input_str: str,
+    fname: str = "<string>",
+    *,
+    dialect: str,
+    use_sqlglot_tokenizer: bool = False,
 ) -> TemplatedFile:
     """Process the entire SQL script, extracting and processing the SELECT statement.
 
@@ -209,32 +406,19 @@ def _process_sql_script(
         input_str: The entire SQL script as a string.
         fname: The filename of the SQL script.
         dialect: The SQLGlot dialect name.
+        use_sqlglot_tokenizer: Whether to locate the SELECT statement with the
+            dialect's SQLGlot tokenizer rather than the lightweight scan.
 
     Returns:
         A TemplatedFile object with accurate slices mapping between source and templated content.
     """
-    tokenizer = Tokenizer(dialect=dialect)
-    tokens = tokenizer.tokenize(input_str)
-
-    select_start_pos = None
-    select_end_pos = None
-
-    select_discovered = False
-    for _, token in enumerate(tokens):
-        if token.token_type == TokenType.SELECT and not select_discovered:
-            select_start_pos = token.start
-            select_discovered = True
-        elif select_discovered:
-            if token.token_type == TokenType.SEMICOLON:
-                select_end_pos = token.end
-                break
-    if select_discovered and select_end_pos is None:
-        select_end_pos = len(input_str)
-    elif not select_discovered:
+    if use_sqlglot_tokenizer:
+        select_bounds = _find_select_statement_sqlglot(input_str, dialect)
+    else:
+        select_bounds = _find_select_statement(input_str)
+    if select_bounds is None:
         raise SQLFluffSkipFile("No SELECT statement found in file", fname)
-
-    if t.TYPE_CHECKING:
-        assert select_start_pos is not None and select_end_pos is not None
+    select_start_pos, select_end_pos, paren_match = select_bounds
 
     select_statement = input_str[select_start_pos:select_end_pos]
 
@@ -242,7 +426,7 @@ def _process_sql_script(
         select_processed,
         select_raw_slices,
         select_templated_slices,
-    ) = _process_select_statement(select_statement, select_start_pos)
+    ) = _process_select_statement(select_statement, select_start_pos, paren_match)
 
     raw_slices = []
     templated_slices = []
@@ -252,13 +436,13 @@ def _process_sql_script(
         raw_slices.append(
             RawFileSlice(
                 raw=input_str[0:select_start_pos],
-                slice_type="templated",
+                slice_type=_TEMPLATED,
                 source_idx=0,
             )
         )
         templated_slices.append(
             TemplatedFileSlice(
-                slice_type="templated",
+                slice_type=_TEMPLATED,
                 source_slice=slice(0, select_start_pos),
                 templated_slice=slice(0, 0),
             )
@@ -272,13 +456,13 @@ def _process_sql_script(
         raw_slices.append(
             RawFileSlice(
                 raw=input_str[select_end_pos:],
-                slice_type="templated",
+                slice_type=_TEMPLATED,
                 source_idx=select_end_pos,
             )
         )
         templated_slices.append(
             TemplatedFileSlice(
-                slice_type="templated",
+                slice_type=_TEMPLATED,
                 source_slice=slice(select_end_pos, len(input_str)),
                 templated_slice=slice(templated_pos, templated_pos),
             )
@@ -304,7 +488,6 @@ class SQLMeshTemplater(RawTemplater):
         override_context: t.Optional[t.Dict[str, t.Any]] = None,
     ) -> None:
         self.working_dir: str = os.getcwd()
-        self.tokenizer = Tokenizer()
         super().__init__(override_context=override_context)
 
     def config_pairs(self) -> t.List[t.Tuple[str, str]]:
@@ -319,7 +502,7 @@ class SQLMeshTemplater(RawTemplater):
         fname: str,
         config: t.Optional["FluffConfig"] = None,
         formatter: t.Optional["OutputStreamFormatter"] = None,
-    ) -> t.Tuple[TemplatedFile, t.List[SQLTemplaterError]]:
+    ) -> t.Tuple[TemplatedFile, t.List["SQLTemplaterError"]]:
         """Compile a sqlmesh model and return the compiled SQL.
 
         Args:
@@ -338,11 +521,22 @@ class SQLMeshTemplater(RawTemplater):
 
         context = self.get_context(fname, config)
 
-        fname = os.path.abspath(fname) if fname != "stdin" else fname
-        original_file_path = os.path.relpath(fname, start=os.getcwd())
+        if fname != "stdin":
+            # Same as os.path.abspath, but without looking up the cwd every time
+            fname = os.path.normpath(os.path.join(self.working_dir, fname))
 
         if not in_str:
+            original_file_path = os.path.relpath(fname, start=self.working_dir)
             raise SQLFluffSkipFile(f"Skipping empty file: {original_file_path}", fname)
 
         dialect = context.get("sqlglot_dialect", None)
-        return _process_sql_script(in_str, fname, dialect=dialect), []
+        use_sqlglot_tokenizer = bool(context.get("use_sqlglot_tokenizer", False))
+        return (
+            _process_sql_script(
+                in_str,
+                fname,
+                dialect=dialect,
+                use_sqlglot_tokenizer=use_sqlglot_tokenizer,
+            ),
+            [],
+        )
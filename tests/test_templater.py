@@ -1,5 +1,8 @@
 from textwrap import dedent
 
+import pytest
+from sqlfluff.core.errors import SQLFluffSkipFile
+
 from sqlfluff_templater_sqlmesh.templater import _process_sql_script
 
 
@@ -60,3 +63,77 @@ def test_sanity():
     FROM "staging"."platform-harness-idp-activeDevelopers"
     """).strip()
     )
+
+
+def test_no_select_skips_file():
+    # Files without a SELECT statement have nothing to lint.
+    with pytest.raises(SQLFluffSkipFile):
+        _process_sql_script(
+            "MODEL (name a.b, kind VIEW);\n-- no query here\n",
+            fname="example.sql",
+            dialect="postgres",
+        )
+
+
+def test_select_without_macros():
+    # A SELECT without macros maps onto the source as a single literal slice.
+    templated_file = _process_sql_script(
+        "MODEL (name a.b);\nSELECT a, b FROM c;\n",
+        fname="example.sql",
+        dialect="postgres",
+    )
+
+    assert templated_file.templated_str == "SELECT a, b FROM c"
+    assert [s.slice_type for s in templated_file.sliced_file] == [
+        "templated",
+        "literal",
+        "templated",
+    ]
+    assert templated_file.sliced_file[1].source_slice == slice(18, 36)
+    assert templated_file.sliced_file[1].templated_slice == slice(0, 18)
+
+
+@pytest.mark.parametrize("use_sqlglot_tokenizer", [False, True])
+def test_select_is_located_outside_comments_and_strings(use_sqlglot_tokenizer):
+    # SELECT keywords and semicolons in comments or quotes must be ignored.
+    input_sql = dedent("""
+    /* select; */
+    MODEL (name a.b, description 'select ;');
+    -- select ;
+    SELECT 'a;b' AS "c;d" /* ; */ FROM e;
+    SELECT 2;
+    """)
+
+    templated_file = _process_sql_script(
+        input_sql,
+        fname="example.sql",
+        dialect="postgres",
+        use_sqlglot_tokenizer=use_sqlglot_tokenizer,
+    )
+
+    assert templated_file.templated_str == "SELECT 'a;b' AS \"c;d\" /* ; */ FROM e"
+
+
+def test_sqlglot_tokenizer_respects_dialect():
+    # MySQL '#' comments are only understood by the dialect's tokenizer.
+    templated_file = _process_sql_script(
+        "# select 1;\nSELECT a # ;\nFROM b;",
+        fname="example.sql",
+        dialect="mysql",
+        use_sqlglot_tokenizer=True,
+    )
+
+    assert templated_file.templated_str == "SELECT a # ;\nFROM b"
+
+
+@pytest.mark.parametrize("use_sqlglot_tokenizer", [False, True])
+def test_macro_arguments_with_quoted_parens(use_sqlglot_tokenizer):
+    # Parentheses in string literals or comments do not close a macro call.
+    templated_file = _process_sql_script(
+        "SELECT @f(')', g(1) /* ) */) AS x, @y FROM t;",
+        fname="example.sql",
+        dialect="postgres",
+        use_sqlglot_tokenizer=use_sqlglot_tokenizer,
+    )
+
+    assert templated_file.templated_str == "SELECT f('PLACEHOLDER') AS x, y FROM t"